@@ -21,7 +21,7 @@ from pypdf import PdfReader
 import httpx
 
 # Contextual Embedding enricher
-from contextual_enricher import enrich_chunks_batch, check_context_model_available, CONTEXT_ENABLED
+from contextual_enricher import enrich_chunks_batch, check_context_model_available, CONTEXT_ENABLED, CONTEXT_WARMUP, warmup_context_model
 
 # GPU Manager voor simple cleanup (binnen process only)
 from gpu_manager import gpu_manager
@@ -921,6 +921,10 @@ def on_startup():
     else:
         init_model()
     load_initial_corpus()
+    # Context model vooraf laden op alle Ollama instances (CONTEXT_WARMUP=true)
+    if CONTEXT_ENABLED and CONTEXT_WARMUP:
+        warmed = warmup_context_model()
+        print(f"[AI-3] Context model warmup: {warmed} instance(s) geladen")
     # Check reranker service
     if RERANK_ENABLED:
         if check_reranker_available():
@@ -1159,6 +1163,7 @@ def ingest_text_endpoint(req: IngestTextRequest):
     - "semantic_sections": Split op headers/secties
     - "conversation_turns": Split op dialoog turns (chatlogs)
     - "table_aware": Houdt tabellen bij elkaar
+    - "content_defined": Stabiele paragraaf-grenzen bij her-ingest (alleen expliciet)
     
     Als chunk_strategy niet opgegeven, wordt automatisch gekozen op basis van document_type.
     """
@@ -1208,6 +1213,7 @@ async def ingest_file_endpoint(
     - "semantic_sections": Headers/secties
     - "conversation_turns": Chatlogs
     - "table_aware": Tabel-preservatie
+    - "content_defined": Stabiele chunks bij her-ingest
     """
     effective_doc_id = doc_id or file.filename
 
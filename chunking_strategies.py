@@ -4,14 +4,85 @@ Modular Chunking Strategies System
 Pluggable chunking strategieën die eenvoudig kunnen worden toegevoegd,
 aangepast of verwijderd zonder de main application code te raken.
 """
+import os
 import re
+import sys
 import logging
-from typing import List, Dict, Any, Optional
+import zlib
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns voor detect_applicability (per document aangeroepen
+# voor elke strategie, dus geen re-module cache lookups in de hot path)
+_MD_HEADER_RE = re.compile(r'(?m)^#{1,3}\s+.+$')
+_UNDERLINE_HEADER_RE = re.compile(r'(?m)^.+\n[=-]{3,}$')
+_SPEAKER_RE = re.compile(
+    r'(?:User|Assistant|Client|Therapist|Coach|Coachee|Q|A|Vraag|Antwoord)\s*:',
+    re.IGNORECASE,
+)
+_TABLE_LINE_RE = re.compile(r'^[\|\+\-].*[\|\+\-]$', re.MULTILINE)
+# Filename hints voor chatlogs: één search i.p.v. een 'in' per woord
+_CHAT_FILENAME_RE = re.compile(r'chat|conversation|whatsapp|telegram|slack')
+
+# Patterns voor de chunk() paden (over het volledige document)
+_PAGE_MARKER_RE = re.compile(r'\[PAGE \d+\]')
+_SECTION_SPLIT_RE = re.compile(r'(?m)^(#{1,3}\s+.+|.+\n[=-]{3,})$')
+_SPEAKER_TURN_RE = re.compile(
+    r'(?m)^((?:User|Assistant|Client|Therapist|Coach|Coachee|Q|A|Vraag|Antwoord)\s*:)',
+    re.IGNORECASE,
+)
+
+# Header-herkenning in SemanticSectionsStrategy.chunk: Markdown of underline
+# header als één alternation, zodat per sectie één match() volstaat
+_SECTION_HEADER_RE = re.compile(r'#{1,3}\s+|.+\n[=-]{3,}$')
+
+# Paragraafgrens: lege regel, ook als die alleen spaties/tabs bevat (PDF-extractie)
+_PARA_SPLIT_RE = re.compile(r'\n[ \t]*\n')
+
+
+def _metadata_fields(metadata: Optional[Dict[str, Any]]) -> Tuple[str, str, str]:
+    """Leid (filename lowercase, mime_type lowercase, extensie) eenmalig af."""
+    meta = metadata or {}
+    fn_lower = (meta.get("filename") or "").lower()
+    mime = (meta.get("mime_type") or "").lower()
+    return fn_lower, mime, os.path.splitext(fn_lower)[1]
+
+
+def _count_up_to(pattern: re.Pattern, text: str, n: int, pos: int = 0, endpos: int = sys.maxsize) -> int:
+    """Tel matches, maar stop zodra er n zijn (detectie checkt alleen drempels)."""
+    count = 0
+    for _ in pattern.finditer(text, pos, endpos):
+        count += 1
+        if count >= n:
+            break
+    return count
+
+
+def _paragraphs(text: str) -> List[str]:
+    """Split op lege regels; gestripte, niet-lege paragrafen (één strip per stuk)."""
+    # Regels met alleen whitespace vereisen een newline gevolgd door spatie/tab;
+    # zonder die combinatie is de (snellere) str.split identiek aan de regex
+    if "\n " in text or "\n\t" in text:
+        parts = _PARA_SPLIT_RE.split(text)
+    else:
+        parts = text.split("\n\n")
+    return [s for p in parts if (s := p.strip())]
+
+
+def _excluded_by(
+    mime_prefixes: Tuple[str, ...], extensions: Tuple[str, ...], mime: str, ext: str
+) -> bool:
+    """True als bekende mime_type/extensie buiten de opgegeven gate vallen."""
+    if mime and mime_prefixes and not mime.startswith(mime_prefixes):
+        return True
+    if ext and extensions and ext not in extensions:
+        return True
+    return False
+
 
 @dataclass
 class ChunkingConfig:
@@ -35,11 +106,24 @@ class ChunkStrategy(ABC):
     - default_config: Default configuratie
     - detect_applicability(): Hoe goed past deze strategie bij de data
     - chunk(): Daadwerkelijke chunking logica
+    
+    Optioneel:
+    - applicable_mime_prefixes / applicable_extensions: als gezet en de
+      metadata spreekt dit tegen, slaat auto-detect de strategie over (0.0)
+    - max_score: hoogste score die detect_applicability kan geven; auto-detect
+      slaat de strategie over als een eerdere strategie al minstens zo hoog scoort
+    
+    Een subklasse die detect_applicability override't moet ook _detect_fast,
+    max_score en de applicable_* gates opnieuw zetten; anders negeert
+    auto-detect die van de parent.
     """
     
     name: str = "base"
     description: str = ""
     default_config: Dict[str, Any] = {}
+    applicable_mime_prefixes: Tuple[str, ...] = ()
+    applicable_extensions: Tuple[str, ...] = ()
+    max_score: float = float("inf")
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
         """
@@ -57,6 +141,28 @@ class ChunkStrategy(ABC):
         """
         return 0.0
     
+    def _detect_fast(
+        self,
+        sample: str,
+        metadata: Optional[Dict[str, Any]],
+        fn_lower: str,
+        mime: str,
+        ext: str,
+    ) -> float:
+        """
+        Variant van detect_applicability voor auto-detect, met de metadata
+        velden al eenmalig afgeleid (zie _metadata_fields). Standaard wordt
+        gewoon detect_applicability aangeroepen.
+        
+        Overrides mogen alleen sample, fn_lower, mime en ext gebruiken: de
+        registry cachet hun score op precies die velden.
+        """
+        return self.detect_applicability(sample, metadata)
+    
+    def _excluded_by_metadata(self, mime: str, ext: str) -> bool:
+        """True als bekende mime_type/extensie de strategie uitsluit."""
+        return _excluded_by(self.applicable_mime_prefixes, self.applicable_extensions, mime, ext)
+    
     @abstractmethod
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
         """
@@ -94,6 +200,7 @@ class DefaultStrategy(ChunkStrategy):
     name = "default"
     description = "Standard paragraph-based chunking with optional overlap"
     default_config = {"max_chars": 800, "overlap": 0}
+    max_score = 0.3
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
         # Default strategie: altijd bruikbaar maar lage prioriteit
@@ -101,30 +208,71 @@ class DefaultStrategy(ChunkStrategy):
     
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
         """Chunk op paragrafen met optionele overlap."""
-        paras = [p.strip() for p in text.split("\n\n") if p.strip()]
-        chunks: List[str] = []
-        buf = ""
-        
-        for p in paras:
-            if len(buf) + len(p) + 2 <= config.max_chars:
-                buf = f"{buf}\n\n{p}" if buf else p
-            else:
-                if buf:
-                    chunks.append(buf)
-                    # Overlap: neem laatste deel mee
-                    if config.overlap > 0 and len(buf) > config.overlap:
-                        buf = buf[-config.overlap:] + "\n\n" + p
-                    else:
-                        buf = p
-                else:
-                    buf = p
+        paras = _paragraphs(text)
+        # Past de hele tekst al: de samengevoegde paragrafen zijn nooit
+        # langer dan de tekst zelf, dus het wordt precies één chunk
+        if len(text) <= config.max_chars:
+            return ["\n\n".join(paras)] if paras else []
+        # Eén keer kiezen i.p.v. per paragraaf op overlap te checken
+        if config.overlap > 0:
+            chunks = self._chunk_overlap(paras, config.max_chars, config.overlap)
+        else:
+            chunks = self._chunk_simple(paras, config.max_chars)
         
-        if buf:
-            chunks.append(buf)
         if not chunks and text.strip():
             chunks = [text.strip()]
         
         return chunks
+    
+    @staticmethod
+    def _chunk_simple(paras: List[str], max_chars: int) -> List[str]:
+        """Paragrafen samenvoegen tot max_chars, zonder overlap."""
+        chunks: List[str] = []
+        # Paragrafen van de huidige chunk; pas bij flush één keer joinen
+        # i.p.v. de buffer string per paragraaf opnieuw op te bouwen.
+        # De lijst wordt hergebruikt (clear) tussen chunks.
+        parts: List[str] = []
+        buf_len = -2  # == len("\n\n".join(parts)); -2 telt de eerste separator weg
+        
+        for p in paras:
+            if parts and buf_len + len(p) + 2 > max_chars:
+                chunks.append("\n\n".join(parts))
+                parts.clear()
+                buf_len = -2
+            parts.append(p)
+            buf_len += len(p) + 2
+        
+        if parts:
+            chunks.append("\n\n".join(parts))
+        return chunks
+    
+    @staticmethod
+    def _chunk_overlap(paras: List[str], max_chars: int, overlap: int) -> List[str]:
+        """Als _chunk_simple, maar elke chunk begint met de staart van de vorige."""
+        chunks: List[str] = []
+        parts: List[str] = []
+        buf_len = -2
+        
+        for p in paras:
+            if parts and buf_len + len(p) + 2 > max_chars:
+                buf = "\n\n".join(parts)
+                chunks.append(buf)
+                parts.clear()
+                buf_len = -2
+                # Overlap: neem laatste deel mee
+                if len(buf) > overlap:
+                    parts.append(buf[-overlap:])
+                    buf_len = overlap
+            parts.append(p)
+            buf_len += len(p) + 2
+        
+        if parts:
+            chunks.append("\n\n".join(parts))
+        return chunks
+
+
+# Gedeelde (stateless) instance voor fallbacks in andere strategieën
+_DEFAULT_STRATEGY = DefaultStrategy()
 
 
 class PageAwareStrategy(ChunkStrategy):
@@ -133,44 +281,57 @@ class PageAwareStrategy(ChunkStrategy):
     name = "page_plus_table_aware"
     description = "Respects page boundaries ([PAGE X]) and preserves tables (for PDFs)"
     default_config = {"max_chars": 1500, "overlap": 200}
+    # [PAGE X] markers komen alleen uit onze PDF extractie
+    applicable_mime_prefixes = ("application/pdf",)
+    max_score = 0.95
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
-        sample = text[:2000]
-        metadata = metadata or {}
+        return self._detect_fast(text[:2000], metadata, *_metadata_fields(metadata))
+    
+    def _detect_fast(self, sample: str, metadata: Optional[Dict[str, Any]], fn_lower: str, mime: str, ext: str) -> float:
+        # Zelfde metadata-gate als auto_detect, zodat detect_applicability
+        # (bv. all_scores in /strategies/detect) dezelfde score geeft
+        if self._excluded_by_metadata(mime, ext):
+            return 0.0
         
         # Hoge score als PAGE markers gevonden
         if "[PAGE" in sample:
             return 0.95
         
         # Medium score voor PDF's
-        if metadata.get("mime_type") == "application/pdf":
+        if mime == "application/pdf":
             return 0.70
         
-        if metadata.get("filename", "").lower().endswith(".pdf"):
+        if fn_lower.endswith(".pdf"):
             return 0.70
         
         return 0.1
     
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
         """Chunk op pagina grenzen."""
-        # Zoek pagina markers
-        pages = re.split(r'\[PAGE \d+\]', text)
-        pages = [p.strip() for p in pages if p.strip()]
+        # Zoek pagina markers; zonder de literal "[PAGE " kan de regex
+        # niet matchen, dus die scan (over het hele document) overslaan
+        if "[PAGE " in text:
+            pages = _PAGE_MARKER_RE.split(text)
+        else:
+            pages = [text]
+        pages = [s for p in pages if (s := p.strip())]
         
         if not pages:
             # Fallback naar default
-            return DefaultStrategy().chunk(text, config)
+            return _DEFAULT_STRATEGY.chunk(text, config)
         
         chunks: List[str] = []
+        max_chars = config.max_chars
         for i, page in enumerate(pages):
             page_header = f"[PAGE {i+1}]\n"
             
             # Als pagina te lang is, split verder
-            if len(page) > config.max_chars:
+            if len(page) > max_chars:
                 # Gebruik default chunking voor lange pagina's
-                sub_chunks = DefaultStrategy().chunk(
+                sub_chunks = _DEFAULT_STRATEGY.chunk(
                     page, 
-                    ChunkingConfig(max_chars=config.max_chars - len(page_header), overlap=config.overlap)
+                    ChunkingConfig(max_chars=max_chars - len(page_header), overlap=config.overlap)
                 )
                 for sc in sub_chunks:
                     chunks.append(page_header + sc)
@@ -186,24 +347,31 @@ class SemanticSectionsStrategy(ChunkStrategy):
     name = "semantic_sections"
     description = "Splits on headers and sections (# ## ### or === ---)"
     default_config = {"max_chars": 1200, "overlap": 150}
+    max_score = 0.85
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
-        sample = text[:2000]
-        metadata = metadata or {}
-        
-        # Detecteer Markdown headers
-        md_headers = len(re.findall(r'(?m)^#{1,3}\s+.+$', sample))
-        if md_headers > 2:
-            return 0.85
-        
-        # Detecteer underline headers
-        underline_headers = len(re.findall(r'(?m)^.+\n[=-]{3,}$', sample))
-        if underline_headers > 1:
-            return 0.80
+        return self._detect_fast(text[:2000], metadata, *_metadata_fields(metadata))
+    
+    def _detect_fast(self, sample: str, metadata: Optional[Dict[str, Any]], fn_lower: str, mime: str, ext: str) -> float:
+        # Detecteer Markdown headers: eerst in de eerste 512 chars (daar
+        # staan ze bij echte Markdown vrijwel altijd), pas bij twijfel
+        # over de hele sample. Zonder '#' kan er geen header zijn.
+        if '#' in sample:
+            md_headers = _count_up_to(_MD_HEADER_RE, sample, 3, 0, 512)
+            if md_headers <= 2 and len(sample) > 512:
+                md_headers = _count_up_to(_MD_HEADER_RE, sample, 3)
+            if md_headers > 2:
+                return 0.85
+        
+        # Detecteer underline headers; elke run van 3+ '='/'-' bevat één van
+        # deze paren/drietallen (ook gemengd, zoals =-=-=-)
+        if any(s in sample for s in ('---', '===', '-=', '=-')):
+            underline_headers = _count_up_to(_UNDERLINE_HEADER_RE, sample, 2)
+            if underline_headers > 1:
+                return 0.80
         
         # Check filename
-        fn = metadata.get("filename", "").lower()
-        if fn.endswith((".md", ".markdown")):
+        if fn_lower.endswith((".md", ".markdown")):
             return 0.75
         
         return 0.2
@@ -211,31 +379,31 @@ class SemanticSectionsStrategy(ChunkStrategy):
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
         """Chunk op headers/secties."""
         # Split op headers
-        sections = re.split(r'(?m)^(#{1,3}\s+.+|.+\n[=-]{3,})$', text)
-        sections = [s.strip() for s in sections if s.strip()]
+        sections = _SECTION_SPLIT_RE.split(text)
+        sections = [st for s in sections if (st := s.strip())]
         
         if len(sections) <= 1:
-            return DefaultStrategy().chunk(text, config)
+            return _DEFAULT_STRATEGY.chunk(text, config)
         
         chunks: List[str] = []
         current_header = ""
+        max_chars = config.max_chars
         
         for section in sections:
             # Check of dit een header is
-            is_header = (re.match(r'^#{1,3}\s+', section) or 
-                        re.match(r'.+\n[=-]{3,}$', section))
+            is_header = _SECTION_HEADER_RE.match(section)
             
             if is_header:
                 current_header = section + "\n\n"
             else:
                 full_section = current_header + section
-                if len(full_section) > config.max_chars:
-                    sub_chunks = DefaultStrategy().chunk(full_section, config)
+                if len(full_section) > max_chars:
+                    sub_chunks = _DEFAULT_STRATEGY.chunk(full_section, config)
                     chunks.extend(sub_chunks)
                 else:
                     chunks.append(full_section)
         
-        return chunks if chunks else DefaultStrategy().chunk(text, config)
+        return chunks if chunks else _DEFAULT_STRATEGY.chunk(text, config)
 
 
 class ConversationStrategy(ChunkStrategy):
@@ -244,23 +412,24 @@ class ConversationStrategy(ChunkStrategy):
     name = "conversation_turns"
     description = "Splits on conversation turns (User:, Assistant:, Q:, etc.)"
     default_config = {"max_chars": 600, "overlap": 0}
+    max_score = 0.90
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
-        sample = text[:2000]
-        metadata = metadata or {}
-        
-        # Detecteer conversatie patterns
-        pattern = r'(?:User|Assistant|Client|Therapist|Coach|Coachee|Q|A|Vraag|Antwoord)\s*:'
-        matches = len(re.findall(pattern, sample, re.IGNORECASE))
-        
-        if matches > 5:
-            return 0.90
-        elif matches > 2:
-            return 0.75
+        return self._detect_fast(text[:2000], metadata, *_metadata_fields(metadata))
+    
+    def _detect_fast(self, sample: str, metadata: Optional[Dict[str, Any]], fn_lower: str, mime: str, ext: str) -> float:
+        # Detecteer conversatie patterns; elke speaker-match bevat een ':'
+        # en de regex (alternation + IGNORECASE) is de duurste detector
+        if ':' in sample:
+            matches = _count_up_to(_SPEAKER_RE, sample, 6)
+            
+            if matches > 5:
+                return 0.90
+            elif matches > 2:
+                return 0.75
         
         # Check filename hints
-        fn = metadata.get("filename", "").lower()
-        if any(word in fn for word in ["chat", "conversation", "whatsapp", "telegram", "slack"]):
+        if _CHAT_FILENAME_RE.search(fn_lower):
             return 0.85
         
         return 0.1
@@ -268,38 +437,39 @@ class ConversationStrategy(ChunkStrategy):
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
         """Chunk per conversatie turn."""
         # Split op speaker patterns
-        pattern = r'(?m)^((?:User|Assistant|Client|Therapist|Coach|Coachee|Q|A|Vraag|Antwoord)\s*:)'
-        turns = re.split(pattern, text, flags=re.IGNORECASE)
+        turns = _SPEAKER_TURN_RE.split(text)
         
         if len(turns) <= 1:
-            return DefaultStrategy().chunk(text, config)
-        
-        chunks: List[str] = []
-        current_turn = ""
-        
-        for i, part in enumerate(turns):
-            if re.match(pattern, part, re.IGNORECASE):
-                if current_turn:
-                    chunks.append(current_turn.strip())
-                current_turn = part
+            return _DEFAULT_STRATEGY.chunk(text, config)
+        
+        # split() met één capture group geeft [voorloop, speaker, tekst,
+        # speaker, tekst, ...]: elke turn is direct speaker + tekst, zonder
+        # string-accumulatie of een match() per speaker
+        # Alleen-whitespace voorloop (bv. een leading newline) is geen turn
+        chunks: List[str] = [lead] if (lead := turns[0].strip()) else []
+        for speaker, body in zip(turns[1::2], turns[2::2]):
+            if _SPEAKER_TURN_RE.match(body):
+                # Tekst begint zelf met een speaker ("User:A: ..."): aparte turns
+                chunks.append(speaker.strip())
+                chunks.append(body.strip())
             else:
-                current_turn += part
-        
-        if current_turn:
-            chunks.append(current_turn.strip())
+                chunks.append((speaker + body).strip())
         
         # Combineer kleine turns tot max_chars
+        # Separator pas bij het joinen; geen buffer-ternary per turn
         merged: List[str] = []
-        buf = ""
+        parts: List[str] = []
+        buf_len = -2  # == len("\n\n".join(parts)); -2 telt de eerste separator weg
+        max_chars = config.max_chars
         for c in chunks:
-            if len(buf) + len(c) + 2 <= config.max_chars:
-                buf = f"{buf}\n\n{c}" if buf else c
-            else:
-                if buf:
-                    merged.append(buf)
-                buf = c
-        if buf:
-            merged.append(buf)
+            if parts and buf_len + len(c) + 2 > max_chars:
+                merged.append("\n\n".join(parts))
+                parts = []
+                buf_len = -2
+            parts.append(c)
+            buf_len += len(c) + 2
+        if parts:
+            merged.append("\n\n".join(parts))
         
         return merged if merged else chunks
 
@@ -310,17 +480,24 @@ class TableAwareStrategy(ChunkStrategy):
     name = "table_aware"
     description = "Preserves table structures (| col | or tabs)"
     default_config = {"max_chars": 1000, "overlap": 100}
+    max_score = 0.85
     
     def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
-        sample = text[:2000]
-        
-        # Detecteer tabel patterns
-        table_lines = len(re.findall(r'^[\|\+\-].*[\|\+\-]$', sample, re.MULTILINE))
-        tab_lines = sum(1 for line in sample.split('\n') if line.count('\t') >= 2)
-        
-        if table_lines > 3 or tab_lines > 3:
+        return self._detect_fast(text[:2000], metadata, *_metadata_fields(metadata))
+    
+    def _detect_fast(self, sample: str, metadata: Optional[Dict[str, Any]], fn_lower: str, mime: str, ext: str) -> float:
+        # Detecteer tabel patterns; stop zodra één signaal al volstaat
+        table_lines = _count_up_to(_TABLE_LINE_RE, sample, 4)
+        if table_lines > 3:
             return 0.85
         
+        # Meer dan 3 regels met >= 2 tabs kan pas vanaf 8 tabs in totaal;
+        # str.count is één C-scan, de per-regel telling alleen als nodig
+        if sample.count('\t') >= 8:
+            tab_lines = sum(1 for line in sample.split('\n') if line.count('\t') >= 2)
+            if tab_lines > 3:
+                return 0.85
+        
         return 0.2
     
     def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
@@ -328,75 +505,201 @@ class TableAwareStrategy(ChunkStrategy):
         lines = text.split('\n')
         chunks: List[str] = []
         current_chunk: List[str] = []
+        # Lopende lengte van current_chunk incl. één '\n' per regel, zodat
+        # de lengtecheck niet per regel de hele chunk opnieuw joint
+        current_len = 0
         in_table = False
         table_buffer: List[str] = []
+        # Config velden als locals: geen attribute lookup per regel
+        max_chars = config.max_chars
+        keep_last_line = config.overlap > 0
         
         for line in lines:
-            is_table_line = bool(re.match(r'^[\|\+\-].*[\|\+\-]$', line.strip()) or 
-                                '\t' in line and line.count('\t') >= 2)
+            # Rand-check i.p.v. regex: begint én eindigt met | + of -
+            # (zelfde als ^[|+-].*[|+-]$, maar zonder backtracking per regel)
+            stripped = line.strip()
+            is_table_line = ((len(stripped) >= 2 and stripped[0] in "|+-" and stripped[-1] in "|+-") or
+                             '\t' in line and line.count('\t') >= 2)
             
             if is_table_line:
-                if not in_table and current_chunk:
-                    # Start nieuwe tabel
-                    chunk_text = '\n'.join(current_chunk)
-                    if chunk_text.strip():
-                        chunks.append(chunk_text)
-                    current_chunk = []
-                in_table = True
+                if not in_table:
+                    if current_chunk:
+                        # Start nieuwe tabel
+                        chunk_text = '\n'.join(current_chunk)
+                        if chunk_text.strip():
+                            chunks.append(chunk_text)
+                        current_chunk = []
+                        current_len = 0
+                    # Marker als eerste regel: de tabel-chunk is dan één join,
+                    # zonder extra kopie voor het "[TABLE]\n" prefix
+                    table_buffer.append("[TABLE]")
+                    in_table = True
                 table_buffer.append(line)
             else:
                 if in_table and table_buffer:
                     # Einde van tabel
-                    table_text = '\n'.join(table_buffer)
-                    chunks.append(f"[TABLE]\n{table_text}")
+                    chunks.append('\n'.join(table_buffer))
                     table_buffer = []
                     in_table = False
                 
                 current_chunk.append(line)
+                current_len += len(line) + 1
                 
                 # Check lengte
-                if len('\n'.join(current_chunk)) > config.max_chars:
+                if current_len - 1 > max_chars:
                     chunk_text = '\n'.join(current_chunk[:-1])
                     if chunk_text.strip():
                         chunks.append(chunk_text)
-                    current_chunk = [current_chunk[-1]] if config.overlap > 0 else []
+                    if keep_last_line:
+                        current_chunk = [line]
+                        current_len = len(line) + 1
+                    else:
+                        current_chunk = []
+                        current_len = 0
         
         # Restanten
         if table_buffer:
-            chunks.append(f"[TABLE]\n{'\n'.join(table_buffer)}")
+            chunks.append('\n'.join(table_buffer))
         if current_chunk:
             chunk_text = '\n'.join(current_chunk)
             if chunk_text.strip():
                 chunks.append(chunk_text)
         
-        return chunks if chunks else DefaultStrategy().chunk(text, config)
+        return chunks if chunks else _DEFAULT_STRATEGY.chunk(text, config)
+
+
+class ContentDefinedStrategy(ChunkStrategy):
+    """
+    Paragraaf-chunking met content-defined grenzen.
+    
+    Of een chunk na een paragraaf eindigt hangt alleen af van de hash van
+    die paragraaf (plus min_chars/max_chars). Een edit midden in een
+    document verandert daardoor alleen de chunks rond de edit; de grenzen
+    erna vallen weer op dezelfde plek, zodat bij her-ingest alleen die
+    chunks opnieuw geëmbed hoeven te worden.
+    
+    Overlap wordt pas na het bepalen van de grenzen toegevoegd (staart van
+    de vorige chunk), zodat de grenzen er niet van afhangen; een edit raakt
+    dan hooguit ook de chunk direct erna.
+    """
+    
+    name = "content_defined"
+    description = "Content-defined paragraph boundaries (stable chunks under edits, for incremental re-indexing)"
+    default_config = {"max_chars": 1000, "overlap": 0, "boundary_bits": 2}
+    max_score = 0.0
+    
+    def detect_applicability(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> float:
+        # Alleen expliciet te kiezen: aan de tekst is niet te zien of het
+        # document later opnieuw (gewijzigd) wordt ge-ingest
+        return 0.0
+    
+    def chunk(self, text: str, config: ChunkingConfig) -> List[str]:
+        """Chunk op paragrafen; grens waar crc32(paragraaf) & mask == 0."""
+        paras = _paragraphs(text)
+        overlap = config.overlap
+        # Ruimte voor de overlap-prefix reserveren (overlap telt mee in max_chars)
+        max_chars = max(config.max_chars - overlap - 2, 1) if overlap > 0 else config.max_chars
+        # Hooguit de helft van max_chars: anders komt elke chunk eerst aan de
+        # harde grens en vallen alle grenzen weer terug op greedy packing
+        min_chars = min(config.extra_params.get("min_chars", max_chars // 2), max_chars // 2)
+        # Gemiddeld één grens per 2**boundary_bits paragrafen
+        mask = (1 << config.extra_params.get("boundary_bits", 2)) - 1
+        
+        chunks: List[str] = []
+        parts: List[str] = []
+        buf_len = -2
+        
+        for p in paras:
+            # Harde grens: chunk zou te groot worden
+            if parts and buf_len + len(p) + 2 > max_chars:
+                chunks.append("\n\n".join(parts))
+                parts.clear()
+                buf_len = -2
+            parts.append(p)
+            buf_len += len(p) + 2
+            # crc32 i.p.v. hash(): moet stabiel zijn over processen heen
+            if buf_len >= min_chars and zlib.crc32(p.encode("utf-8", "surrogatepass")) & mask == 0:
+                chunks.append("\n\n".join(parts))
+                parts.clear()
+                buf_len = -2
+        
+        if parts:
+            chunks.append("\n\n".join(parts))
+        
+        if not chunks:
+            return _DEFAULT_STRATEGY.chunk(text, config)
+        if overlap > 0:
+            chunks = [chunks[0]] + [f"{prev[-overlap:]}\n\n{c}" for prev, c in zip(chunks, chunks[1:])]
+        return chunks
 
 
 # ============================================================================
 # Strategy Registry
 # ============================================================================
 
+# Aantal (strategie, sample, filename, mime) scores dat auto_detect onthoudt;
+# her-ingest van hetzelfde document slaat dan alle detectie over
+_DETECT_CACHE_SIZE = 1024
+
+
+def _defining_class(cls: type, attr: str) -> type:
+    """Eerste klasse in de MRO van cls die attr zelf definieert."""
+    for klass in cls.__mro__:
+        if attr in vars(klass):
+            return klass
+    return object
+
+
 class ChunkStrategyRegistry:
     """Centraal register voor alle chunking strategieën."""
     
     def __init__(self):
         self.strategies: Dict[str, ChunkStrategy] = {}
+        # Strategieën met een eigen _detect_fast (pure functie van de velden)
+        self._cacheable: set = set()
+        # max_score per strategie, alleen als die bij detect_applicability hoort
+        self._max_scores: Dict[str, float] = {}
+        # (mime prefixes, extensies) per strategie, idem
+        self._gates: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        self._cached_score = lru_cache(maxsize=_DETECT_CACHE_SIZE)(self._score)
         self._register_default_strategies()
+        self._default = self.strategies["default"]
     
     def _register_default_strategies(self):
         """Registreer alle built-in strategieën."""
+        self.register(_DEFAULT_STRATEGY)
         for strategy_class in [
-            DefaultStrategy,
             PageAwareStrategy,
             SemanticSectionsStrategy,
             ConversationStrategy,
             TableAwareStrategy,
+            ContentDefinedStrategy,
         ]:
             self.register(strategy_class())
     
     def register(self, strategy: ChunkStrategy):
         """Registreer een nieuwe strategie."""
         self.strategies[strategy.name] = strategy
+        # _detect_fast, max_score en de metadata-gate zijn alleen te vertrouwen
+        # als ze uit dezelfde klasse (of een subklasse) komen als
+        # detect_applicability; een subklasse die alleen detect_applicability
+        # override't zou anders de score (of uitsluiting) van de parent krijgen
+        cls = type(strategy)
+        detect_owner = _defining_class(cls, "detect_applicability")
+        fast_owner = _defining_class(cls, "_detect_fast")
+        if fast_owner is not ChunkStrategy and issubclass(fast_owner, detect_owner):
+            self._cacheable.add(strategy.name)
+        else:
+            self._cacheable.discard(strategy.name)
+        if issubclass(_defining_class(cls, "max_score"), detect_owner):
+            self._max_scores[strategy.name] = strategy.max_score
+        else:
+            self._max_scores[strategy.name] = float("inf")
+        self._gates[strategy.name] = tuple(
+            getattr(strategy, attr) if issubclass(_defining_class(cls, attr), detect_owner) else ()
+            for attr in ("applicable_mime_prefixes", "applicable_extensions")
+        )
+        self._cached_score.cache_clear()
         logger.info(f"Registered chunking strategy: {strategy.name}")
     
     def get(self, name: str) -> Optional[ChunkStrategy]:
@@ -407,6 +710,10 @@ class ChunkStrategyRegistry:
         """Lijst alle beschikbare strategieën."""
         return [strategy.get_info() for strategy in self.strategies.values()]
     
+    def _score(self, name: str, sample: str, fn_lower: str, mime: str, ext: str) -> float:
+        """Ongecachte score van een cacheable strategie (zie _cached_score)."""
+        return self.strategies[name]._detect_fast(sample, None, fn_lower, mime, ext)
+    
     def auto_detect(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """
         Detecteer beste strategie voor deze data.
@@ -420,18 +727,35 @@ class ChunkStrategyRegistry:
         # Gebruik eerste 2000 chars voor detectie (snelheid)
         sample = text[:2000]
         
-        scores = {}
+        # Metadata velden eenmalig afleiden i.p.v. per strategie
+        fn_lower, mime, ext = _metadata_fields(metadata)
+        
+        best_strategy = None
+        best_score = float("-inf")
         for name, strategy in self.strategies.items():
-            try:
-                score = strategy.detect_applicability(sample, metadata)
-                scores[name] = score
-                logger.debug(f"Strategy '{name}' applicability: {score:.2f}")
-            except Exception as e:
-                logger.warning(f"Error detecting applicability for '{name}': {e}")
-                scores[name] = 0.0
+            # Bij gelijke score wint de eerst geregistreerde strategie, dus een
+            # strategie die hooguit best_score haalt kan niet meer winnen
+            max_score = self._max_scores.get(name, float("inf"))
+            if max_score <= best_score:
+                logger.debug(f"Strategy '{name}' skipped (max {max_score:.2f})")
+                continue
+            if _excluded_by(*self._gates.get(name, ((), ())), mime, ext):
+                score = 0.0
+                logger.debug(f"Strategy '{name}' excluded by metadata")
+            else:
+                try:
+                    if name in self._cacheable:
+                        score = self._cached_score(name, sample, fn_lower, mime, ext)
+                    else:
+                        score = strategy.detect_applicability(sample, metadata)
+                    logger.debug(f"Strategy '{name}' applicability: {score:.2f}")
+                except Exception as e:
+                    logger.warning(f"Error detecting applicability for '{name}': {e}")
+                    score = 0.0
+            if score > best_score:
+                best_strategy, best_score = name, score
         
-        best_strategy = max(scores, key=scores.get)
-        logger.info(f"Auto-detected chunking strategy: {best_strategy} (score: {scores[best_strategy]:.2f})")
+        logger.info(f"Auto-detected chunking strategy: {best_strategy} (score: {best_score:.2f})")
         
         return best_strategy
     
@@ -462,7 +786,7 @@ class ChunkStrategyRegistry:
         strategy = self.get(strategy_name)
         if not strategy:
             logger.warning(f"Strategy '{strategy_name}' not found, using default")
-            strategy = self.get("default")
+            strategy = self._default
         
         # Merge config met defaults
         final_config = {**strategy.default_config}
@@ -482,18 +806,16 @@ class ChunkStrategyRegistry:
             return chunks
         except Exception as e:
             logger.error(f"Chunking failed with '{strategy_name}': {e}, falling back to default")
-            return DefaultStrategy().chunk(text, chunking_config)
+            return _DEFAULT_STRATEGY.chunk(text, chunking_config)
 
 
-# Global registry instance
-_registry = None
+# Global registry instance: eenmalig bij import aangemaakt, zodat de
+# singleton thread-safe is en get_registry() geen check/lock nodig heeft.
+_registry = ChunkStrategyRegistry()
 
 
 def get_registry() -> ChunkStrategyRegistry:
     """Get global registry instance (singleton)."""
-    global _registry
-    if _registry is None:
-        _registry = ChunkStrategyRegistry()
     return _registry
 
 
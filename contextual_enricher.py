@@ -11,10 +11,17 @@ Quality: 8B is zeer capabel voor context extraction van 1-2 zinnen.
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import hashlib
+import json
 import logging
 import os
-from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 
@@ -32,6 +39,117 @@ CONTEXT_TIMEOUT = float(os.getenv("CONTEXT_TIMEOUT", "60"))
 CONTEXT_ENABLED = os.getenv("CONTEXT_ENABLED", "true").lower() == "true"
 # 6 workers = 6 GPU's parallel, laat 2 vrij voor andere taken
 CONTEXT_MAX_WORKERS = int(os.getenv("CONTEXT_MAX_WORKERS", "6"))
+# Aantal chunks per LLM call (batch prompting); 1 = één call per chunk
+CONTEXT_BATCH_SIZE = max(1, int(os.getenv("CONTEXT_BATCH_SIZE", "1")))
+# Max wachttijd om een batch te vullen voordat hij toch verstuurd wordt
+CONTEXT_BATCH_WAIT_MS = float(os.getenv("CONTEXT_BATCH_WAIT_MS", "20"))
+# Aantal gegenereerde contexten dat in-memory onthouden wordt (0 = uit)
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "10000"))
+# Hoe lang Ollama het model geladen houdt na een request ("-1" = altijd)
+CONTEXT_KEEP_ALIVE = os.getenv("CONTEXT_KEEP_ALIVE", "30m")
+# Context window (KV cache) per request; 0 = Ollama/model default
+CONTEXT_NUM_CTX = int(os.getenv("CONTEXT_NUM_CTX", "0"))
+# Prompt batch (tokens per forward pass, bv. 512); kleiner = minder compute
+# buffer in VRAM naast de KV cache; 0 = Ollama/model default
+CONTEXT_NUM_BATCH = int(os.getenv("CONTEXT_NUM_BATCH", "0"))
+# Aantal prompt-tokens dat Ollama vasthoudt als de context vol raakt en
+# verschuift (de vaste systeem/document prefix); 0 = model default
+CONTEXT_NUM_KEEP = int(os.getenv("CONTEXT_NUM_KEEP", "0"))
+# Context model bij startup op alle instances laden (geen cold start bij eerste ingest)
+CONTEXT_WARMUP = os.getenv("CONTEXT_WARMUP", "false").lower() == "true"
+
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client() -> httpx.Client:
+    """
+    Gedeelde sync client (keep-alive): geen nieuwe TCP connectie per call.
+    httpx.Client is thread-safe; alleen het aanmaken gebeurt onder lock.
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                limits = httpx.Limits(
+                    max_connections=CONTEXT_MAX_WORKERS * 4,
+                    max_keepalive_connections=CONTEXT_MAX_WORKERS * 2,
+                )
+                _http_client = httpx.Client(limits=limits, timeout=CONTEXT_TIMEOUT)
+                atexit.register(_http_client.close)
+    return _http_client
+
+
+# LRU cache van contexten: herhaalde chunks (headers, footers, boilerplate)
+# kosten dan geen LLM call. Sleutel = hash van alles wat in de prompt gaat.
+_context_cache: "OrderedDict[str, str]" = OrderedDict()
+_context_cache_lock = threading.Lock()
+
+
+def _prompt_fields(document_metadata: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    """Document velden zoals ze in de prompt komen: (bestand, type, onderwerpen, entiteiten)."""
+    doc_type = document_metadata.get("document_type", "onbekend")
+    filename = document_metadata.get("filename", "onbekend")
+    topics = document_metadata.get("main_topics", [])
+    entities = document_metadata.get("main_entities", [])
+    
+    topics_str = ", ".join(topics[:5]) if topics else "niet gespecificeerd"
+    entities_str = ", ".join(entities[:5]) if entities else "niet gespecificeerd"
+    return str(filename), str(doc_type), topics_str, entities_str
+
+
+def _context_cache_key(chunk_text: str, document_metadata: Dict[str, Any]) -> str:
+    """blake2b over model en precies de waarden die in de prompt komen."""
+    # JSON i.p.v. een scheidingsteken: velden met "|" erin kunnen dan niet
+    # samen dezelfde sleutel geven als een andere verdeling over de velden
+    key_source = json.dumps(
+        [CONTEXT_MODEL, *_prompt_fields(document_metadata), chunk_text[:1500]],
+        ensure_ascii=False,
+    )
+    return hashlib.blake2b(key_source.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    if CONTEXT_CACHE_SIZE <= 0:
+        return None
+    with _context_cache_lock:
+        context = _context_cache.get(key)
+        if context is not None:
+            _context_cache.move_to_end(key)
+        return context
+
+
+def _cache_put(key: str, context: str) -> None:
+    if CONTEXT_CACHE_SIZE <= 0:
+        return
+    with _context_cache_lock:
+        _context_cache[key] = context
+        _context_cache.move_to_end(key)
+        while len(_context_cache) > CONTEXT_CACHE_SIZE:
+            _context_cache.popitem(last=False)
+
+
+def _load_options() -> Dict[str, Any]:
+    """Options die bepalen hoe Ollama het model laadt (wijzigen = herladen)."""
+    options: Dict[str, Any] = {}
+    if CONTEXT_NUM_CTX > 0:
+        options["num_ctx"] = CONTEXT_NUM_CTX
+    if CONTEXT_NUM_BATCH > 0:
+        options["num_batch"] = CONTEXT_NUM_BATCH
+    return options
+
+
+def _model_options(num_predict: int) -> Dict[str, Any]:
+    """Ollama options voor context generatie."""
+    options: Dict[str, Any] = {
+        "temperature": 0.1,
+        "num_predict": num_predict,
+        **_load_options(),
+    }
+    if CONTEXT_NUM_KEEP > 0:
+        options["num_keep"] = CONTEXT_NUM_KEEP
+    return options
 
 
 def get_ollama_url_for_worker(worker_id: int) -> str:
@@ -58,6 +176,35 @@ Regels:
 - Geef ALLEEN de contextbeschrijving, geen uitleg of commentaar"""
 
 
+def _build_context_payload(chunk_text: str, document_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Bouw het Ollama /api/chat request voor één chunk."""
+    filename, doc_type, topics_str, entities_str = _prompt_fields(document_metadata)
+    
+    user_prompt = f"""Document informatie:
+- Bestand: {filename}
+- Type: {doc_type}
+- Onderwerpen: {topics_str}
+- Entiteiten: {entities_str}
+
+Passage:
+\"\"\"{chunk_text[:1500]}\"\"\"
+
+Beschrijf de context van deze passage in 1-2 zinnen:"""
+
+    payload = {
+        "model": CONTEXT_MODEL,
+        "messages": [
+            {"role": "system", "content": CONTEXT_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "stream": False,
+        # Houd model geladen voor volgende chunks (veel sneller!)
+        "keep_alive": CONTEXT_KEEP_ALIVE,
+        "options": _model_options(150),  # Kort antwoord
+    }
+    return payload
+
+
 def generate_context_for_chunk(
     chunk_text: str,
     document_metadata: Dict[str, Any],
@@ -82,14 +229,82 @@ def generate_context_for_chunk(
     if not CONTEXT_ENABLED:
         return None
     
-    # Bouw de prompt
-    doc_type = document_metadata.get("document_type", "onbekend")
-    filename = document_metadata.get("filename", "onbekend")
-    topics = document_metadata.get("main_topics", [])
-    entities = document_metadata.get("main_entities", [])
+    cache_key = _context_cache_key(chunk_text, document_metadata)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
     
-    topics_str = ", ".join(topics[:5]) if topics else "niet gespecificeerd"
-    entities_str = ", ".join(entities[:5]) if entities else "niet gespecificeerd"
+    payload = _build_context_payload(chunk_text, document_metadata)
+    
+    try:
+        # Get Ollama URL for this worker (load balancing)
+        ollama_url = get_ollama_url_for_worker(worker_id)
+        
+        # Gebruik Ollama's native API endpoint
+        resp = _get_http_client().post(
+            f"{ollama_url}/api/chat",
+            json=payload,
+            timeout=timeout
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        content = data["message"]["content"].strip()
+        _cache_put(cache_key, content)
+        return content
+    except Exception as e:
+        logger.warning(f"Context generation failed (worker {worker_id}): {e}")
+        return None
+
+
+async def agenerate_context_for_chunk(
+    client: httpx.AsyncClient,
+    chunk_text: str,
+    document_metadata: Dict[str, Any],
+    worker_id: int = 0
+) -> Optional[str]:
+    """
+    Async variant van generate_context_for_chunk over een gedeelde client.
+    
+    Returns:
+        Context string of None bij fout
+    """
+    if not CONTEXT_ENABLED:
+        return None
+    
+    cache_key = _context_cache_key(chunk_text, document_metadata)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    payload = _build_context_payload(chunk_text, document_metadata)
+    
+    try:
+        ollama_url = get_ollama_url_for_worker(worker_id)
+        resp = await client.post(f"{ollama_url}/api/chat", json=payload)
+        resp.raise_for_status()
+        data = resp.json()
+        content = data["message"]["content"].strip()
+        _cache_put(cache_key, content)
+        return content
+    except Exception as e:
+        logger.warning(f"Context generation failed (worker {worker_id}): {e}")
+        return None
+
+
+# "[3] Context ..." regels in het antwoord op een batch prompt; per regel,
+# zodat een context met zelf "[...]" erin niet wordt afgekapt
+_BATCH_ANSWER_RE = re.compile(r"(?m)^\s*\[(\d+)\]\s*(.+?)\s*$")
+
+
+def _build_batch_payload(chunk_texts: List[str], document_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Bouw één Ollama /api/chat request voor meerdere chunks (genummerd)."""
+    filename, doc_type, topics_str, entities_str = _prompt_fields(document_metadata)
+    
+    passages = "\n\n".join(
+        f'Passage [{i}]:\n"""{text[:1500]}"""'
+        for i, text in enumerate(chunk_texts, start=1)
+    )
+    k = len(chunk_texts)
     
     user_prompt = f"""Document informatie:
 - Bestand: {filename}
@@ -97,43 +312,182 @@ def generate_context_for_chunk(
 - Onderwerpen: {topics_str}
 - Entiteiten: {entities_str}
 
-Passage:
-\"\"\"{chunk_text[:1500]}\"\"\"
+{passages}
 
-Beschrijf de context van deze passage in 1-2 zinnen:"""
+Beschrijf de context van elke passage in 1-2 zinnen.
+Antwoord met precies {k} regels in dit formaat:
+[1] context van passage 1
+[2] context van passage 2"""
 
-    payload = {
+    return {
         "model": CONTEXT_MODEL,
         "messages": [
             {"role": "system", "content": CONTEXT_SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
         "stream": False,
-        # Houd model geladen voor volgende chunks (veel sneller!)
-        "keep_alive": "30m",
-        "options": {
-            "temperature": 0.1,
-            "num_predict": 150,  # Kort antwoord
-        },
+        "keep_alive": CONTEXT_KEEP_ALIVE,
+        "options": _model_options(150 * k),
     }
+
+
+def _parse_batch_answer(content: str, k: int) -> Optional[List[str]]:
+    """Contexten 1..k uit het antwoord, of None als er één ontbreekt."""
+    found = {}
+    for m in _BATCH_ANSWER_RE.finditer(content):
+        idx = int(m.group(1))
+        text = m.group(2).strip()
+        if 1 <= idx <= k and text and idx not in found:
+            found[idx] = text
+    if len(found) != k:
+        return None
+    return [found[i] for i in range(1, k + 1)]
+
+
+async def agenerate_contexts_for_batch(
+    client: httpx.AsyncClient,
+    chunk_texts: List[str],
+    document_metadata: Dict[str, Any],
+    worker_id: int = 0
+) -> Optional[List[str]]:
+    """
+    Genereer context voor meerdere chunks in één LLM call.
+    
+    De vaste prompt (systeem + document info) wordt zo één keer per batch
+    geëvalueerd i.p.v. per chunk.
+    
+    Returns:
+        Lijst contexten (zelfde volgorde als chunk_texts), of None bij
+        een fout of een onvolledig antwoord (caller valt dan terug op
+        per-chunk generatie)
+    """
+    if not CONTEXT_ENABLED:
+        return None
+    
+    payload = _build_batch_payload(chunk_texts, document_metadata)
     
     try:
-        # Get Ollama URL for this worker (load balancing)
         ollama_url = get_ollama_url_for_worker(worker_id)
-        
-        # Gebruik Ollama's native API endpoint
-        resp = httpx.post(
-            f"{ollama_url}/api/chat",
-            json=payload,
-            timeout=timeout
-        )
+        resp = await client.post(f"{ollama_url}/api/chat", json=payload)
         resp.raise_for_status()
         data = resp.json()
-        content = data["message"]["content"].strip()
-        return content
+        contexts = _parse_batch_answer(data["message"]["content"], len(chunk_texts))
     except Exception as e:
-        logger.warning(f"Context generation failed (worker {worker_id}): {e}")
+        logger.warning(f"Batch context generation failed (worker {worker_id}): {e}")
+        return None
+    
+    if contexts is None:
+        logger.warning(f"Batch context answer incomplete (worker {worker_id}), falling back per chunk")
         return None
+    
+    for text, context in zip(chunk_texts, contexts):
+        _cache_put(_context_cache_key(text, document_metadata), context)
+    return contexts
+
+
+class BatchingEnricher:
+    """
+    Micro-batching dispatcher voor context generatie.
+    
+    Losse chunks worden via submit() in een queue gezet; een achtergrond
+    task verzamelt ze tot max_batch stuks of tot max_wait_ms verstreken
+    is, en stuurt elke batch als één prompt (agenerate_contexts_for_batch).
+    Bij een mislukte batch volgt per-chunk generatie. Gebruik als async
+    context manager; bij afsluiten worden openstaande batches afgemaakt.
+    """
+    
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        document_metadata: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        max_batch: int = CONTEXT_BATCH_SIZE,
+        max_wait_ms: float = CONTEXT_BATCH_WAIT_MS,
+    ):
+        self.client = client
+        self.document_metadata = document_metadata
+        self.semaphore = semaphore
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._flushes: List[asyncio.Task] = []
+        self._batches_sent = 0
+    
+    async def __aenter__(self) -> "BatchingEnricher":
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # None = stop-signaal: dispatcher verstuurt nog wat in de queue staat
+        await self._queue.put(None)
+        await self._dispatcher
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    async def submit(self, chunk_text: str) -> Optional[str]:
+        """Zet een chunk in de queue en wacht op zijn context (of None)."""
+        # Cache hit: niet in een batch prompt meenemen
+        cached = _cache_get(_context_cache_key(chunk_text, self.document_metadata))
+        if cached is not None:
+            return cached
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((chunk_text, future))
+        return await future
+    
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Versturen in een eigen task: volgende batch kan al gevuld worden
+            self._flushes.append(asyncio.create_task(self._flush(batch, self._batches_sent)))
+            self._batches_sent += 1
+    
+    async def _flush(self, batch: List[tuple], batch_no: int) -> None:
+        chunk_texts = [chunk for chunk, _ in batch]
+        try:
+            contexts = None
+            if len(batch) > 1:
+                async with self.semaphore:
+                    contexts = await agenerate_contexts_for_batch(
+                        self.client, chunk_texts, self.document_metadata, worker_id=batch_no
+                    )
+            if contexts is None:
+                # Eén chunk, of batch-antwoord onbruikbaar: per chunk
+                contexts = await asyncio.gather(*(
+                    self._single(chunk, batch_no * self.max_batch + j)
+                    for j, chunk in enumerate(chunk_texts)
+                ))
+        except Exception as e:
+            logger.warning(f"Batch {batch_no} enrichment failed: {e}")
+            contexts = [None] * len(batch)
+        
+        for (_, future), context in zip(batch, contexts):
+            if not future.done():
+                future.set_result(context)
+    
+    async def _single(self, chunk_text: str, worker_id: int) -> Optional[str]:
+        async with self.semaphore:
+            return await agenerate_context_for_chunk(
+                self.client, chunk_text, self.document_metadata, worker_id=worker_id
+            )
 
 
 def enrich_chunk_with_context(
@@ -168,21 +522,22 @@ def enrich_chunk_with_context(
     return "\n".join(parts)
 
 
-def enrich_chunks_batch(
+async def aenrich_chunks_batch(
     chunks: List[str],
     document_metadata: Dict[str, Any],
-    max_workers: int = CONTEXT_MAX_WORKERS
+    max_workers: int = CONTEXT_MAX_WORKERS,
+    batch_size: int = CONTEXT_BATCH_SIZE
 ) -> List[str]:
     """
-    Verrijk een batch chunks met context (parallel processing).
+    Verrijk een batch chunks met context (async, max_workers calls tegelijk).
     
-    Args:
-        chunks: Lijst van chunk teksten
-        document_metadata: Metadata voor alle chunks
-        max_workers: Aantal parallelle LLM calls
+    Alle requests delen één AsyncClient (connection pool, keep-alive);
+    een semaphore begrenst het aantal gelijktijdige LLM calls. Bij
+    batch_size > 1 bundelt een BatchingEnricher tot batch_size chunks
+    per prompt.
     
     Returns:
-        Lijst van verrijkte chunk teksten
+        Lijst van verrijkte chunk teksten (zelfde volgorde als chunks)
     """
     if not CONTEXT_ENABLED or not chunks:
         # Fallback: alleen metadata toevoegen, geen LLM
@@ -191,50 +546,156 @@ def enrich_chunks_batch(
             for chunk in chunks
         ]
     
-    enriched_chunks = [None] * len(chunks)
     total_chunks = len(chunks)
     completed_chunks = 0
+    semaphore = asyncio.Semaphore(max_workers)
+    limits = httpx.Limits(max_connections=max_workers, max_keepalive_connections=max_workers)
     
-    def process_chunk(idx: int, chunk: str) -> tuple:
-        # Use chunk index as worker_id for load balancing
-        context = generate_context_for_chunk(chunk, document_metadata, worker_id=idx)
-        enriched = enrich_chunk_with_context(chunk, context, document_metadata)
-        return idx, enriched
-    
-    # Parallel processing met progress tracking
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(process_chunk, i, chunk): i 
-            for i, chunk in enumerate(chunks)
-        }
+    def report_progress() -> None:
+        nonlocal completed_chunks
+        completed_chunks += 1
+        # Progress logging elke 10 chunks of bij voltooiing
+        if completed_chunks % 10 == 0 or completed_chunks == total_chunks:
+            pct = int(completed_chunks * 100 / total_chunks)
+            print(f"[ENRICHMENT] Progress: {completed_chunks}/{total_chunks} chunks ({pct}%)")
+    
+    async with httpx.AsyncClient(limits=limits, timeout=CONTEXT_TIMEOUT) as client:
+        batcher: Optional[BatchingEnricher] = None
+        # Identieke chunks in dit document delen één (lopende) LLM call
+        in_flight: Dict[str, asyncio.Future] = {}
         
-        for future in as_completed(futures):
-            try:
-                idx, enriched = future.result()
-                enriched_chunks[idx] = enriched
-                completed_chunks += 1
-                
-                # Progress logging elke 10 chunks of bij voltooiing
-                if completed_chunks % 10 == 0 or completed_chunks == total_chunks:
-                    pct = int(completed_chunks * 100 / total_chunks)
-                    print(f"[ENRICHMENT] Progress: {completed_chunks}/{total_chunks} chunks ({pct}%)")
-                    
-            except Exception as e:
-                # Fallback bij fout
-                idx = futures[future]
-                enriched_chunks[idx] = enrich_chunk_with_context(
-                    chunks[idx], None, document_metadata
+        async def fetch_context(idx: int, chunk: str) -> Optional[str]:
+            if batcher is not None:
+                return await batcher.submit(chunk)
+            async with semaphore:
+                # Use chunk index as worker_id for load balancing
+                return await agenerate_context_for_chunk(
+                    client, chunk, document_metadata, worker_id=idx
                 )
-                completed_chunks += 1
-                logger.warning(f"Chunk {idx} enrichment failed: {e}")
+        
+        async def process_chunk(idx: int, chunk: str) -> str:
+            try:
+                key = _context_cache_key(chunk, document_metadata)
+                task = in_flight.get(key)
+                if task is None:
+                    task = in_flight[key] = asyncio.ensure_future(fetch_context(idx, chunk))
+                context = await asyncio.shield(task)
+                return enrich_chunk_with_context(chunk, context, document_metadata)
+            finally:
+                # Ook mislukte chunks tellen mee, anders haalt progress nooit 100%
+                report_progress()
+        
+        async def run_all() -> List[Any]:
+            return await asyncio.gather(
+                *(process_chunk(i, chunk) for i, chunk in enumerate(chunks)),
+                return_exceptions=True,
+            )
+        
+        if batch_size > 1:
+            async with BatchingEnricher(
+                client, document_metadata, semaphore, max_batch=batch_size
+            ) as batcher:
+                results = await run_all()
+        else:
+            results = await run_all()
+    
+    enriched_chunks = []
+    for idx, result in enumerate(results):
+        if isinstance(result, BaseException):
+            # Fallback bij fout
+            logger.warning(f"Chunk {idx} enrichment failed: {result}")
+            result = enrich_chunk_with_context(chunks[idx], None, document_metadata)
+        enriched_chunks.append(result)
     
     return enriched_chunks
 
 
+def enrich_chunks_batch(
+    chunks: List[str],
+    document_metadata: Dict[str, Any],
+    max_workers: int = CONTEXT_MAX_WORKERS,
+    batch_size: int = CONTEXT_BATCH_SIZE
+) -> List[str]:
+    """
+    Verrijk een batch chunks met context (parallel processing).
+    
+    Sync wrapper rond aenrich_chunks_batch voor bestaande callers.
+    
+    Args:
+        chunks: Lijst van chunk teksten
+        document_metadata: Metadata voor alle chunks
+        max_workers: Aantal parallelle LLM calls
+        batch_size: Aantal chunks per LLM call (1 = per chunk)
+    
+    Returns:
+        Lijst van verrijkte chunk teksten
+    """
+    return _run_sync(aenrich_chunks_batch(chunks, document_metadata, max_workers, batch_size))
+
+
+def _run_sync(coro):
+    """Draai een coroutine vanuit sync code, ook als er al een loop draait."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    # Aangeroepen vanuit een draaiende event loop (bv. sync ingest vanuit
+    # een async endpoint): asyncio.run kan daar niet, dus eigen thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _instance_urls() -> List[str]:
+    """Alle Ollama instances waar context calls heen kunnen gaan."""
+    if not OLLAMA_MULTI_GPU:
+        return [OLLAMA_BASE_URL]
+    return [get_ollama_url_for_worker(i) for i in range(OLLAMA_NUM_INSTANCES)]
+
+
+async def awarmup_context_model() -> int:
+    """
+    Laad het context model op alle instances (parallel).
+    
+    Een /api/generate request zonder prompt laadt alleen het model, met
+    dezelfde keep_alive (en num_ctx/num_batch) als de context calls, zodat
+    de eerste ingest geen model-laadtijd betaalt.
+    
+    Returns:
+        Aantal instances waarop het model geladen is
+    """
+    payload: Dict[str, Any] = {"model": CONTEXT_MODEL, "keep_alive": CONTEXT_KEEP_ALIVE}
+    load_options = _load_options()
+    if load_options:
+        payload["options"] = load_options
+    
+    async with httpx.AsyncClient(timeout=CONTEXT_TIMEOUT) as client:
+        
+        async def warm(url: str) -> bool:
+            try:
+                resp = await client.post(f"{url}/api/generate", json=payload)
+                resp.raise_for_status()
+                return True
+            except Exception as e:
+                logger.warning(f"Context model warmup failed on {url}: {e}")
+                return False
+        
+        results = await asyncio.gather(*(warm(url) for url in _instance_urls()))
+    
+    return sum(results)
+
+
+def warmup_context_model() -> int:
+    """Sync wrapper rond awarmup_context_model (voor startup hooks)."""
+    if not CONTEXT_ENABLED:
+        return 0
+    return _run_sync(awarmup_context_model())
+
+
 def check_context_model_available() -> bool:
     """Check of het context model beschikbaar is in Ollama."""
     try:
-        resp = httpx.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5.0)
+        resp = _get_http_client().get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5.0)
         resp.raise_for_status()
         data = resp.json()
         models = [m.get("name", "") for m in data.get("models", [])]
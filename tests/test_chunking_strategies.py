@@ -0,0 +1,103 @@
+"""Tests voor chunking_strategies (draai met: python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking_strategies import (  # noqa: E402
+    ChunkStrategyRegistry,
+    PageAwareStrategy,
+    SemanticSectionsStrategy,
+)
+
+
+def test_page_aware_mime_gate_matches_auto_detect():
+    text = "[PAGE 1]\nEerste pagina.\n\n[PAGE 2]\nTweede pagina."
+    metadata = {"mime_type": "text/plain"}
+    registry = ChunkStrategyRegistry()
+    
+    assert PageAwareStrategy().detect_applicability(text, metadata) == 0.0
+    assert registry.auto_detect(text, metadata) == "default"
+    # Zonder of met PDF mime_type blijven de markers doorslaggevend
+    assert PageAwareStrategy().detect_applicability(text, None) == 0.95
+    assert PageAwareStrategy().detect_applicability(text, {"mime_type": "application/pdf"}) == 0.95
+
+
+def test_conversation_leading_whitespace_is_not_a_turn():
+    registry = ChunkStrategyRegistry()
+    text = "\nUser: hi\nAssistant: hello"
+    
+    assert registry.chunk_text(text, "conversation_turns") == ["User: hi\n\nAssistant: hello"]
+    # Eerste turn langer dan max_chars: geen lege chunk ervoor
+    long_text = "\n \nUser: " + "x" * 50 + "\nAssistant: ok"
+    chunks = registry.chunk_text(long_text, "conversation_turns", {"max_chars": 20})
+    assert chunks == ["User: " + "x" * 50, "Assistant: ok"]
+    assert all(chunks)
+
+
+def test_subclass_overriding_only_detect_applicability_is_used():
+    class AlwaysPages(PageAwareStrategy):
+        name = "always_pages"
+        
+        def detect_applicability(self, text, metadata=None):
+            return 0.99
+    
+    class FastSections(SemanticSectionsStrategy):
+        name = "fast_sections"
+        
+        def _detect_fast(self, sample, metadata, fn_lower, mime, ext):
+            return 0.0
+    
+    registry = ChunkStrategyRegistry()
+    registry.register(AlwaysPages())
+    registry.register(FastSections())
+    text = "[PAGE 1]\nEerste pagina.\n\n[PAGE 2]\nTweede pagina."
+    
+    # Overgeërfde _detect_fast/max_score (0.95) van de parent worden genegeerd
+    assert registry.auto_detect(text) == "always_pages"
+    assert registry.auto_detect("Platte tekst zonder structuur.") == "always_pages"
+    # Ook de overgeërfde mime-gate geldt niet: zelfde score als detect_applicability
+    metadata = {"mime_type": "text/plain"}
+    assert registry.get("always_pages").detect_applicability(text, metadata) == 0.99
+    assert registry.auto_detect(text, metadata) == "always_pages"
+    # De eigen gate van page_plus_table_aware blijft gelden
+    assert registry.get("page_plus_table_aware").detect_applicability(text, metadata) == 0.0
+    # Een eigen _detect_fast in een subklasse blijft de snelle (gecachte) route
+    assert "fast_sections" in registry._cacheable
+    assert "always_pages" not in registry._cacheable
+
+
+def test_content_defined_boundaries_stable_after_insertion():
+    registry = ChunkStrategyRegistry()
+    paras = [f"Paragraaf {i} over artikel {i * 7} van de subsidieregeling." for i in range(60)]
+    edited = paras[:30] + ["Een nieuw ingevoegde paragraaf."] + paras[30:]
+    
+    for config in ({"max_chars": 400, "min_chars": 150}, {"max_chars": 400, "min_chars": 150, "overlap": 40}):
+        before = registry.chunk_text("\n\n".join(paras), "content_defined", config)
+        after = registry.chunk_text("\n\n".join(edited), "content_defined", config)
+        # Alleen de chunk met de ingevoegde paragraaf is nieuw
+        assert len(before) == len(after)
+        assert len(set(after) - set(before)) == 1
+    
+    # Overlap: elke chunk begint met de staart van de vorige
+    chunks = registry.chunk_text("\n\n".join(paras), "content_defined", {"max_chars": 400, "overlap": 40})
+    assert all(c.startswith(prev[-40:] + "\n\n") for prev, c in zip(chunks, chunks[1:]))
+
+
+def test_content_defined_stable_without_explicit_min_chars():
+    registry = ChunkStrategyRegistry()
+    paras = [f"Paragraaf {i} over artikel {i * 7} van de subsidieregeling." for i in range(60)]
+    edited = paras[:30] + ["Een nieuw ingevoegde paragraaf."] + paras[30:]
+    
+    # min_chars groter dan max_chars / 2 wordt begrensd i.p.v. greedy packing
+    for config in ({"max_chars": 400}, {"max_chars": 400, "min_chars": 500}, {"max_chars": 1000, "overlap": 499}):
+        before = registry.chunk_text("\n\n".join(paras), "content_defined", config)
+        after = registry.chunk_text("\n\n".join(edited), "content_defined", config)
+        assert len(set(after) - set(before)) <= 2, config
+
+
+def test_semantic_sections_mixed_underline_headers():
+    text = "Intro\n=-=-=-=\n\ntext\n\nUsage\n-=-=-=-\n\nmore"
+    
+    assert SemanticSectionsStrategy().detect_applicability(text) == 0.80
+    assert ChunkStrategyRegistry().auto_detect(text) == "semantic_sections"
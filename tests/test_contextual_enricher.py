@@ -0,0 +1,246 @@
+"""Tests voor contextual_enricher (draai met: python -m pytest tests)."""
+import asyncio
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contextual_enricher  # noqa: E402
+from contextual_enricher import _parse_batch_answer  # noqa: E402
+
+_PASSAGE_RE = re.compile(r'Passage(?: \[(\d+)\])?:\n"""(.*?)"""', re.DOTALL)
+
+
+class FakeOllama:
+    """Nep /api/chat: context = "ctx " + passage, ook voor batch prompts."""
+    
+    def __init__(self, bad_batch: bool = False, fail_batch: bool = False):
+        self.bad_batch = bad_batch
+        self.fail_batch = fail_batch
+        self.calls = []
+    
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        passages = _PASSAGE_RE.findall(payload["messages"][-1]["content"])
+        self.calls.append([text for _, text in passages])
+        if passages[0][0]:
+            if self.fail_batch:
+                return httpx.Response(500)
+            # Batch prompt; bad_batch laat de laatste regel weg
+            lines = [f"[{idx}] ctx {text}" for idx, text in passages]
+            content = "\n".join(lines[:-1] if self.bad_batch else lines)
+        else:
+            content = f"ctx {passages[0][1]}"
+        return httpx.Response(200, json={"message": {"content": content}})
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    """Patch de AsyncClient constructie met een MockTransport en een lege cache."""
+    server = FakeOllama()
+    real_client = httpx.AsyncClient
+    
+    def client_factory(*args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(server)
+        return real_client(*args, **kwargs)
+    
+    monkeypatch.setattr(contextual_enricher.httpx, "AsyncClient", client_factory)
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_ENABLED", True)
+    monkeypatch.setattr(contextual_enricher, "_context_cache", OrderedDict())
+    return server
+
+
+def test_parse_batch_answer_keeps_bracketed_content():
+    content = "[1] Tabel [TABLE] met omzet per kwartaal.\n[2] ctx2 of batch [x]\n"
+    
+    assert _parse_batch_answer(content, 2) == [
+        "Tabel [TABLE] met omzet per kwartaal.",
+        "ctx2 of batch [x]",
+    ]
+
+
+def test_parse_batch_answer_missing_index_returns_none():
+    assert _parse_batch_answer("[1] Eerste context.\n[3] Derde context.", 3) is None
+    assert _parse_batch_answer("Geen genummerde regels.", 1) is None
+    # Een index die alleen midden in een regel staat telt niet
+    assert _parse_batch_answer("[1] Zie ook [2] hierna.", 2) is None
+
+
+def test_parse_batch_answer_duplicate_index_keeps_first():
+    content = "Hier zijn de contexten:\n[1] Eerste.\n[2] Tweede.\n[1] Dubbel.\n[4] Buiten bereik."
+    
+    assert _parse_batch_answer(content, 2) == ["Eerste.", "Tweede."]
+
+
+def test_model_options_num_keep(monkeypatch):
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_KEEP", 0)
+    assert "num_keep" not in contextual_enricher._model_options(150)
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_KEEP", 256)
+    assert contextual_enricher._model_options(150)["num_keep"] == 256
+
+
+def test_load_options_shared_with_warmup(monkeypatch):
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_CTX", 0)
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_BATCH", 0)
+    assert contextual_enricher._load_options() == {}
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_CTX", 2048)
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_NUM_BATCH", 512)
+    
+    options = contextual_enricher._model_options(150)
+    assert options["num_ctx"] == 2048 and options["num_batch"] == 512
+    
+    warmups = []
+    
+    def handler(request):
+        warmups.append(json.loads(request.content))
+        return httpx.Response(200, json={})
+    
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        contextual_enricher.httpx, "AsyncClient",
+        lambda *a, **kw: real_client(*a, transport=httpx.MockTransport(handler), **kw),
+    )
+    monkeypatch.setattr(contextual_enricher, "OLLAMA_MULTI_GPU", False)
+    
+    assert contextual_enricher.warmup_context_model() == 1
+    assert warmups[0]["options"] == {"num_ctx": 2048, "num_batch": 512}
+
+
+def test_progress_counts_failed_chunks(fake_ollama, monkeypatch, capsys):
+    real_generate = contextual_enricher.agenerate_context_for_chunk
+    
+    async def generate(client, chunk_text, document_metadata, worker_id=0):
+        if chunk_text == "boem":
+            raise RuntimeError("boem")
+        return await real_generate(client, chunk_text, document_metadata, worker_id)
+    
+    monkeypatch.setattr(contextual_enricher, "agenerate_context_for_chunk", generate)
+    chunks = ["een", "boem", "drie"]
+    
+    result = asyncio.run(contextual_enricher.aenrich_chunks_batch(chunks, {}, max_workers=2))
+    
+    # Mislukte chunk: alleen metadata, en telt wel mee in de progress
+    assert result == ["[Context: ctx een]\n\neen", "\nboem", "[Context: ctx drie]\n\ndrie"]
+    assert "[ENRICHMENT] Progress: 3/3 chunks (100%)" in capsys.readouterr().out
+
+
+def test_batching_enricher_max_batch_keeps_order(fake_ollama):
+    chunks = [f"chunk {i}" for i in range(7)]
+    
+    result = asyncio.run(contextual_enricher.aenrich_chunks_batch(chunks, {}, max_workers=4, batch_size=3))
+    
+    assert result == [f"[Context: ctx {c}]\n\n{c}" for c in chunks]
+    # Batches van max 3; de losse rest gaat als gewone per-chunk call
+    assert sorted(map(len, fake_ollama.calls)) == [1, 3, 3]
+    assert sorted(c for call in fake_ollama.calls for c in call) == sorted(chunks)
+
+
+def test_batching_enricher_flushes_after_time_window(fake_ollama):
+    async def run():
+        async with contextual_enricher.httpx.AsyncClient() as client:
+            async with contextual_enricher.BatchingEnricher(
+                client, {}, asyncio.Semaphore(4), max_batch=10, max_wait_ms=10
+            ) as batcher:
+                first = asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+                await asyncio.sleep(0.1)
+                second = await asyncio.gather(batcher.submit("c"), batcher.submit("d"))
+                return await first + second
+    
+    assert asyncio.run(run()) == ["ctx a", "ctx b", "ctx c", "ctx d"]
+    # Niet gewacht op max_batch: twee batches van 2
+    assert fake_ollama.calls == [["a", "b"], ["c", "d"]]
+
+
+def test_batching_enricher_falls_back_on_bad_batch_answer(fake_ollama):
+    fake_ollama.bad_batch = True
+    chunks = ["x", "y", "z"]
+    
+    result = asyncio.run(contextual_enricher.aenrich_chunks_batch(chunks, {}, batch_size=3))
+    
+    assert result == [f"[Context: ctx {c}]\n\n{c}" for c in chunks]
+    # Eén (onvolledige) batch call, daarna per chunk
+    assert fake_ollama.calls[0] == chunks
+    assert sorted(fake_ollama.calls[1:]) == [["x"], ["y"], ["z"]]
+
+
+def test_batching_enricher_falls_back_on_failed_batch_call(fake_ollama):
+    fake_ollama.fail_batch = True
+    
+    result = asyncio.run(contextual_enricher.aenrich_chunks_batch(["p", "q"], {}, batch_size=2))
+    
+    assert result == ["[Context: ctx p]\n\np", "[Context: ctx q]\n\nq"]
+    assert fake_ollama.calls[0] == ["p", "q"]
+    assert sorted(fake_ollama.calls[1:]) == [["p"], ["q"]]
+
+
+def test_enrich_chunks_batch_from_running_loop(fake_ollama):
+    async def sync_caller_in_loop():
+        # Sync API aangeroepen vanuit een draaiende loop: _run_sync gebruikt een thread
+        return contextual_enricher.enrich_chunks_batch(["a", "b"], {"filename": "f.txt"}, batch_size=2)
+    
+    assert asyncio.run(sync_caller_in_loop()) == [
+        "[Document: f.txt]\n[Context: ctx a]\n\na",
+        "[Document: f.txt]\n[Context: ctx b]\n\nb",
+    ]
+    assert fake_ollama.calls == [["a", "b"]]
+
+
+def test_context_cache_key_is_unambiguous():
+    key = contextual_enricher._context_cache_key
+    
+    assert key("c", {"document_type": "a|b", "filename": "c"}) != key("c", {"document_type": "a", "filename": "b|c"})
+    assert key("c", {"main_topics": ["a,b"]}) != key("c", {"main_topics": ["a", "b"]})
+    # Ontbrekende velden komen als "onbekend" in de prompt, dus zelfde sleutel
+    assert key("c", {}) == key("c", {"document_type": "onbekend", "filename": "onbekend"})
+    assert key("c", {}) != key("c", {"filename": ""})
+
+
+def test_context_cache_lru_eviction(monkeypatch):
+    monkeypatch.setattr(contextual_enricher, "_context_cache", OrderedDict())
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_CACHE_SIZE", 2)
+    
+    contextual_enricher._cache_put("a", "ctx a")
+    contextual_enricher._cache_put("b", "ctx b")
+    assert contextual_enricher._cache_get("a") == "ctx a"  # a is nu het recentst gebruikt
+    contextual_enricher._cache_put("c", "ctx c")
+    
+    assert contextual_enricher._cache_get("b") is None
+    assert contextual_enricher._cache_get("a") == "ctx a"
+    assert contextual_enricher._cache_get("c") == "ctx c"
+
+
+def test_context_cache_disabled(fake_ollama, monkeypatch):
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_CACHE_SIZE", 0)
+    
+    contextual_enricher._cache_put("a", "ctx a")
+    assert contextual_enricher._cache_get("a") is None
+    for _ in range(2):
+        asyncio.run(contextual_enricher.aenrich_chunks_batch(["x"], {}))
+    assert fake_ollama.calls == [["x"], ["x"]]
+
+
+def test_context_cache_hit_skips_llm(fake_ollama, monkeypatch):
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_CACHE_SIZE", 10)
+    
+    first = asyncio.run(contextual_enricher.aenrich_chunks_batch(["x"], {}))
+    second = asyncio.run(contextual_enricher.aenrich_chunks_batch(["x"], {}))
+    
+    assert first == second == ["[Context: ctx x]\n\nx"]
+    assert fake_ollama.calls == [["x"]]
+
+
+def test_identical_chunks_share_one_call_in_flight(fake_ollama, monkeypatch):
+    # Cache uit: de dedupe moet uit de in-flight administratie komen
+    monkeypatch.setattr(contextual_enricher, "CONTEXT_CACHE_SIZE", 0)
+    chunks = ["kop", "tekst 1", "kop", "tekst 2", "kop"]
+    
+    result = asyncio.run(contextual_enricher.aenrich_chunks_batch(chunks, {}, max_workers=4))
+    
+    assert result == [f"[Context: ctx {c}]\n\n{c}" for c in chunks]
+    assert sorted(fake_ollama.calls) == [["kop"], ["tekst 1"], ["tekst 2"]]